@@ -163,6 +163,43 @@ def modular_matrix_inverse(matrix, modulus):
     
     return mod_inv
 
+# Modular inverse of every residue mod 26 (0 where none exists)
+DET_INVERSE = np.array([pow(x, -1, 26) if math.gcd(x, 26) == 1 else 0 for x in range(26)], dtype=np.int64)
+
+def inverse_3x3_mod26(matrices):
+    """
+    Exact modular inverse of a stack of 3×3 matrices (mod 26).
+
+    Uses the integer adjugate, so no floating point is involved.
+
+    Args:
+        matrices: Integer array of shape (..., 3, 3)
+
+    Returns:
+        tuple: (inverses, invertible) where invertible is a boolean mask
+    """
+    m = np.asarray(matrices, dtype=np.int64) % 26
+    r0, r1, r2 = m[..., 0, :], m[..., 1, :], m[..., 2, :]
+    c0, c1, c2 = np.cross(r1, r2), np.cross(r2, r0), np.cross(r0, r1)
+    det = (r0 * c0).sum(axis=-1) % 26
+    adjugate = np.stack([c0, c1, c2], axis=-1)
+    inverses = (DET_INVERSE[det][..., None, None] * adjugate) % 26
+    return inverses, DET_INVERSE[det] != 0
+
+def strip_length_prefix(full_ciphertext):
+    """
+    Split a CustomCipher ciphertext into its encoded length and Hill body.
+
+    The prefix holds the length as two base-26 digits offset from 'A'; for
+    messages of 676 letters or more the first one lies past 'Z', so it is
+    decoded from its code point rather than checked against A-Z.
+
+    Returns:
+        tuple: (original_length, ciphertext without the prefix)
+    """
+    original_length = (ord(full_ciphertext[0]) - ord('A')) * 26 + (ord(full_ciphertext[1]) - ord('A'))
+    return original_length, full_ciphertext[2:]
+
 def known_plaintext_attack(plaintext, ciphertext):
     """
     Attempts to break the Hill cipher using a known-plaintext attack.
@@ -255,11 +292,7 @@ def combined_attack(full_ciphertext, known_plaintext=None, known_ciphertext_port
         results['error'] = "Ciphertext too short"
         return results
     
-    len_char1 = full_ciphertext[0]
-    len_char2 = full_ciphertext[1]
-    original_length = (ord(len_char1) - ord('A')) * 26 + (ord(len_char2) - ord('A'))
-    
-    ciphertext_no_prefix = full_ciphertext[2:]
+    original_length, ciphertext_no_prefix = strip_length_prefix(full_ciphertext)
     
     print(f"\n{'='*70}")
     print(f"COMBINED CRYPTANALYSIS ATTACK")
@@ -0,0 +1,375 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import time
+import multiprocessing
+from collections import Counter
+from multiprocessing.connection import wait as wait_connections
+
+from attack import combined_attack, frequency_analysis_attack, strip_length_prefix
+from twolayer import COMMON_BIGRAMS, two_layer_attack
+
+# Messages with fewer letters than this are not attacked
+MIN_SCORED_LETTERS = 20
+
+# A decryption scoring at least this many standard deviations above chance
+# is reported as broken. Wrong decryptions from every audit attack on real
+# English at 60-450 letters stayed below 3.1; correct ones clear 4.0 from
+# about 150 letters, and about 70% of the time at 100 letters.
+BROKEN_THRESHOLD = 4.0
+
+# Attacks only check their budget between steps, so they stop this far
+# ahead of the hard deadline (a fraction of the budget, capped in seconds)
+# to leave time to send a partial result before the child is terminated
+KILL_GRACE = 0.2
+KILL_GRACE_MAX = 2.0
+
+
+def score_decryption(text):
+    """
+    How far a decryption's digrams are from chance, on the same scale for
+    every attack.
+
+    Counts adjacent letter pairs that are common English digrams and
+    compares the count with what the same letters in random order would
+    give, as a number of standard deviations. The attacks fit their keys to
+    single-letter frequencies, which the expected count already accounts
+    for, so a key that only overfits letter frequencies scores near 0.
+    Texts with fewer than MIN_SCORED_LETTERS letters score 0.
+    """
+    letters = ''.join(c for c in (text or '').upper() if 'A' <= c <= 'Z')
+    if len(letters) < MIN_SCORED_LETTERS:
+        return 0.0
+
+    pairs = len(letters) - 1
+    hits = sum(1 for a, b in zip(letters, letters[1:]) if a + b in COMMON_BIGRAMS)
+    counts = Counter(letters)
+    p = sum(counts[bigram[0]] * counts[bigram[1]] for bigram in COMMON_BIGRAMS) / len(letters) ** 2
+    if p <= 0 or p >= 1:
+        return 0.0
+    return (hits - pairs * p) / math.sqrt(pairs * p * (1 - p))
+
+
+def _run_combined(ciphertext, time_left):
+    results = combined_attack(ciphertext)
+    return {
+        'success': bool(results['success']),
+        'method_used': results['method_used'],
+        'vigenere_key': results['vigenere_key'],
+        'hill_key': None if results['hill_key'] is None else results['hill_key'].tolist(),
+        'decrypted_text': results['decrypted_text'],
+        'confidence': float(results['confidence']),
+        'error': results.get('error'),
+    }
+
+
+def _run_frequency_analysis(ciphertext, time_left):
+    original_length, body = strip_length_prefix(ciphertext)
+    recovered_key, decrypted, confidence = frequency_analysis_attack(body[:original_length])
+    return {
+        'vigenere_key': recovered_key,
+        'decrypted_text': decrypted,
+        'confidence': float(confidence),
+    }
+
+
+def _run_two_layer(ciphertext, time_left):
+    # The audit already runs one message per process, so search in-process
+    results = two_layer_attack(ciphertext, time_budget=time_left, workers=1)
+    return {
+        'success': bool(results['success']),
+        'full_key': results['full_key'],
+        'vigenere_key': results['vigenere_key'],
+        'hill_key': None if results['hill_key'] is None else results['hill_key'].tolist(),
+        'decrypted_text': results['decrypted_text'],
+        'confidence': float(results['confidence']),
+        'timed_out': results['timed_out'],
+        'error': results.get('error'),
+    }
+
+
+# Attacks run on every message, in order. Each runner takes the full
+# ciphertext and the seconds left in the message's budget, and returns a
+# JSON-serialisable dict that includes a 'confidence' score. two_layer runs
+# first because it is the only attack that recovers keys from real
+# CustomCipher output, so a tight budget should not be spent before it.
+AUDIT_ATTACKS = [
+    ('two_layer', _run_two_layer),
+    ('combined', _run_combined),
+    ('frequency_analysis', _run_frequency_analysis),
+]
+
+
+def _run_attacks(ciphertext, soft_deadline, conn):
+    """
+    Body of a message's child process: run AUDIT_ATTACKS in order and send
+    each result over conn as soon as it is ready. soft_deadline is the
+    time.time() at which the attacks should stop, or None.
+    """
+    for name, runner in AUDIT_ATTACKS:
+        time_left = None if soft_deadline is None else max(soft_deadline - time.time(), 0)
+        attack_start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                attack_result = runner(ciphertext, time_left)
+        except Exception as e:
+            attack_result = {'confidence': 0.0, 'error': str(e)}
+        attack_result['elapsed'] = time.perf_counter() - attack_start
+        conn.send((name, attack_result))
+    conn.close()
+
+
+class _MessageAudit:
+    """
+    One message whose attacks run in a child process, so that the process
+    can be terminated when the message's time budget runs out.
+    """
+
+    def __init__(self, message_id, ciphertext, time_budget=None):
+        self.result = {
+            'id': message_id,
+            'ciphertext_length': len(ciphertext),
+            'attacks': {},
+            'skipped': [],
+            'timed_out': False,
+            'best_attack': None,
+            'best_score': None,
+            'broken': False,
+        }
+        self.start = time.perf_counter()
+        self.deadline = None if time_budget is None else self.start + time_budget
+        self.process = None
+        self.conn = None
+
+        if len(ciphertext) < 2:
+            self.result['error'] = "Ciphertext too short"
+        elif sum(1 for c in ciphertext[2:] if 'A' <= c <= 'Z') < MIN_SCORED_LETTERS:
+            self.result['error'] = "Too few letters to score"
+        else:
+            soft_deadline = None
+            if time_budget is not None:
+                soft_deadline = time.time() + time_budget - min(KILL_GRACE * time_budget, KILL_GRACE_MAX)
+            self.conn, child_conn = multiprocessing.Pipe(duplex=False)
+            self.process = multiprocessing.Process(target=_run_attacks, args=(ciphertext, soft_deadline, child_conn))
+            self.process.start()
+            child_conn.close()
+
+    @property
+    def started(self):
+        return self.process is not None
+
+    def expired(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def receive(self):
+        """
+        Read one attack result. Returns True once the child has finished.
+        """
+        try:
+            name, attack_result = self.conn.recv()
+        except EOFError:
+            return True
+        self.result['attacks'][name] = attack_result
+        return False
+
+    def terminate(self):
+        self.process.terminate()
+        self.result['timed_out'] = True
+
+    def finish(self):
+        """
+        Reap the child process and complete the result.
+        """
+        result = self.result
+        if self.started:
+            self.process.join()
+            self.conn.close()
+            result['skipped'] = [name for name, _ in AUDIT_ATTACKS if name not in result['attacks']]
+            if result['skipped'] and not result['timed_out']:
+                result['error'] = f"Attack process exited with code {self.process.exitcode}"
+
+        for name, attack_result in result['attacks'].items():
+            attack_result['score'] = score_decryption(attack_result.get('decrypted_text'))
+            attack_result['broken'] = attack_result['score'] >= BROKEN_THRESHOLD
+            if result['best_score'] is None or attack_result['score'] > result['best_score']:
+                result['best_score'] = attack_result['score']
+                if attack_result['broken']:
+                    result['best_attack'] = name
+                    result['broken'] = True
+
+        result['elapsed'] = time.perf_counter() - self.start
+        return result
+
+
+def _audit_messages(messages, time_budget, workers, on_result):
+    """
+    Audit (message_id, ciphertext) pairs with at most `workers` child
+    processes at a time, calling on_result with each finished result.
+    """
+    queue = iter(messages)
+    running = []
+
+    while True:
+        while len(running) < workers:
+            message = next(queue, None)
+            if message is None:
+                break
+            audit = _MessageAudit(*message, time_budget)
+            if audit.started:
+                running.append(audit)
+            else:
+                on_result(audit.finish())
+
+        if not running:
+            break
+
+        deadlines = [audit.deadline for audit in running if audit.deadline is not None]
+        timeout = max(min(deadlines) - time.perf_counter(), 0) if deadlines else None
+        ready = wait_connections([audit.conn for audit in running], timeout)
+
+        for audit in list(running):
+            finished = audit.conn in ready and audit.receive()
+            if not finished and audit.expired():
+                audit.terminate()
+                finished = True
+            if finished:
+                running.remove(audit)
+                on_result(audit.finish())
+
+
+def audit_message(message_id, ciphertext, time_budget=None):
+    """
+    Run every attack in AUDIT_ATTACKS against a single ciphertext.
+
+    The attacks run one after another in a child process, with their
+    progress output captured rather than printed. They are asked to stop
+    a grace period before the time budget runs out (see KILL_GRACE), so an
+    attack that overruns slightly still returns its partial result; at the
+    budget itself the child is terminated: results already sent are kept, the
+    remaining attacks are listed as skipped and the message is marked as
+    timed out. Each attack's decryption gets a 'score' from
+    score_decryption, comparable across attacks, and counts as 'broken' at
+    BROKEN_THRESHOLD or above; the attack's own 'confidence' is kept as
+    reported. best_attack is the highest-scoring attack that broke the
+    message, or None.
+
+    Args:
+        message_id: Identifier recorded in the result (line number in the corpus)
+        ciphertext: Complete encrypted message (with length prefix)
+        time_budget: Seconds allowed for this message, or None for no limit
+
+    Returns:
+        dict: Per-attack results and timings, plus the best score reached
+    """
+    results = []
+    _audit_messages([(message_id, ciphertext)], time_budget, 1, results.append)
+    return results[0]
+
+
+def read_corpus(path):
+    """
+    Read a corpus file with one ciphertext per line.
+
+    Blank lines are ignored. The 2-character length prefix is kept exactly
+    as written: for messages of 676 letters or more its first character
+    lies outside A-Z (and may even be a whitespace character), so only the
+    body after it is upper-cased and stripped of whitespace. Each message
+    is identified by its 1-based line number.
+
+    Returns:
+        list: (message_id, ciphertext) pairs
+    """
+    messages = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            body = ''.join(c for c in line[2:] if not c.isspace()).upper()
+            messages.append((line_number, line[:2] + body))
+    return messages
+
+
+def load_checkpoint(path):
+    """
+    Return the set of message ids already recorded in a checkpoint file.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {int(line) for line in f if line.strip()}
+
+
+def run_audit(corpus_path, output_path, checkpoint_path=None, workers=None, time_budget=None):
+    """
+    Audit every ciphertext in a corpus file, several messages at a time.
+
+    One JSON result per message is appended to output_path as soon as it
+    completes, and its id is then appended to the checkpoint file. Messages
+    already listed in the checkpoint are skipped, so an interrupted run can
+    be restarted with the same arguments and will pick up where it left off.
+
+    Args:
+        corpus_path: File with one ciphertext per line
+        output_path: JSONL file that results are appended to
+        checkpoint_path: Checkpoint file (defaults to output_path + '.ckpt')
+        workers: Messages audited in parallel (defaults to the CPU count)
+        time_budget: Per-message time budget in seconds, or None for no limit
+
+    Returns:
+        dict: Counts of messages audited, skipped, broken and timed out in this run
+    """
+    if checkpoint_path is None:
+        checkpoint_path = output_path + '.ckpt'
+
+    done = load_checkpoint(checkpoint_path)
+    pending = [(message_id, ct) for message_id, ct in read_corpus(corpus_path) if message_id not in done]
+
+    summary = {'audited': 0, 'already_done': len(done), 'broken': 0, 'timed_out': 0}
+    if not pending:
+        return summary
+
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            open(checkpoint_path, 'a', encoding='utf-8') as ckpt:
+
+        def record(result):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            ckpt.write(f"{result['id']}\n")
+            ckpt.flush()
+
+            summary['audited'] += 1
+            if result['broken']:
+                summary['broken'] += 1
+            if result['timed_out']:
+                summary['timed_out'] += 1
+
+        _audit_messages(pending, time_budget, workers or os.cpu_count() or 1, record)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the attack suite over a corpus of ciphertexts.")
+    parser.add_argument('corpus', help="file with one ciphertext per line")
+    parser.add_argument('output', help="JSONL file to append results to")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: OUTPUT.ckpt)")
+    parser.add_argument('--workers', type=int, help="messages audited in parallel (default: CPU count)")
+    parser.add_argument('--time-budget', type=float, help="seconds allowed per message")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    summary = run_audit(args.corpus, args.output, args.checkpoint, args.workers, args.time_budget)
+    audit_time = time.time() - start_time
+
+    print(f"Audited: {summary['audited']} messages ({summary['already_done']} already in checkpoint)")
+    print(f"Broken: {summary['broken']}")
+    print(f"Timed out: {summary['timed_out']}")
+    print(f"Audit Time: {audit_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
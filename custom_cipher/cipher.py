@@ -1,6 +1,9 @@
 import numpy as np
 import math
 
+# Hill key known to give an invertible matrix, used when a key cannot be adjusted
+FALLBACK_HILL_KEY = "GYBNQKURP"
+
 class CustomCipher:
     def __init__(self, key):
         if len(key) < 10:
@@ -66,8 +69,8 @@ class CustomCipher:
                     return matrix, adjusted_key_str
         
         # Strategy 3: Use a known good matrix and mix it with the key
-        # GYBNQKURP is known to work, use it as fallback
-        fallback = "GYBNQKURP"
+        # FALLBACK_HILL_KEY is known to work, use it as fallback
+        fallback = FALLBACK_HILL_KEY
         fallback_num = [ord(c) - ord('A') for c in fallback]
         
         # Mix original key with fallback
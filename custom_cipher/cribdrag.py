@@ -0,0 +1,239 @@
+import itertools
+import math
+
+import numpy as np
+
+from attack import inverse_3x3_mod26
+from streaming import ENGLISH_FREQ
+
+
+def _clean_crib(crib):
+    """
+    Prepare a crib the way the cipher prepares plaintext (letters only, J → I).
+    """
+    return ''.join(c for c in crib.upper() if 'A' <= c <= 'Z').replace('J', 'I')
+
+
+def _plan_crib(crib_nums, alignment, period):
+    """
+    Work out how a crib constrains the Hill key for one block alignment and
+    one Vigenère block period.
+
+    Blocks whose Vigenère offsets repeat every `period` blocks share the same
+    additive term, so differences of crib blocks in the same phase class
+    depend on the Hill matrix only. Three independent differences solve for
+    the matrix; every further difference becomes a linear relation that the
+    ciphertext blocks must satisfy, which is checked for all offsets at once.
+
+    Returns:
+        dict or None: Solving and checking coefficients, or None if the crib
+        is too short or its differences are not invertible mod 26
+    """
+    n_blocks = (len(crib_nums) - alignment) // 3
+    if n_blocks - min(period, n_blocks) < 4:
+        return None
+
+    blocks = np.array(crib_nums[alignment:alignment + 3 * n_blocks]).reshape(n_blocks, 3)
+
+    # Pair every crib block with the first block of its phase class
+    firsts = list(range(min(period, n_blocks)))
+    pairs = [(j % period, j) for j in range(period, n_blocks)]
+
+    for solve in itertools.combinations(range(len(pairs)), 3):
+        delta_p = np.stack([blocks[pairs[i][1]] - blocks[pairs[i][0]] for i in solve], axis=-1)
+        delta_p_inv, invertible = inverse_3x3_mod26(delta_p)
+        if invertible:
+            break
+    else:
+        return None
+
+    # Each remaining pair gives C[jo] - C[jf] == sum_t mu_t (C[jo_t] - C[jf_t])
+    relations = []
+    for i, (jf, jo) in enumerate(pairs):
+        if i in solve:
+            continue
+        mu = delta_p_inv @ (blocks[jo] - blocks[jf]) % 26
+        coefficients = np.zeros(n_blocks, dtype=np.int64)
+        coefficients[jo] += 1
+        coefficients[jf] -= 1
+        for t, s in enumerate(solve):
+            coefficients[pairs[s][1]] -= mu[t]
+            coefficients[pairs[s][0]] += mu[t]
+        relations.append(coefficients % 26)
+
+    return {
+        'blocks': blocks,
+        'firsts': firsts,
+        'solve_pairs': [pairs[i] for i in solve],
+        'delta_p_inv': delta_p_inv,
+        'relations': np.array(relations),
+    }
+
+
+def _consistent_offsets(cipher_blocks, cipher_columns, relations, first_offset):
+    """
+    Block offsets at which the ciphertext satisfies every crib relation.
+    """
+    n_blocks = relations.shape[1]
+    n_offsets = len(cipher_blocks) - n_blocks + 1
+    if n_offsets <= first_offset:
+        return np.empty(0, dtype=np.int64)
+
+    # Screen every offset on the first letter of the first relation using
+    # contiguous slices; only about 1 in 26 offsets survive to the full check
+    first = relations[0]
+    total = np.zeros(n_offsets - first_offset, dtype=np.int32)
+    for j in np.nonzero(first)[0]:
+        total += first[j] * cipher_columns[0, first_offset + j:n_offsets + j]
+    candidates = first_offset + np.nonzero(total % 26 == 0)[0]
+
+    for coefficients in relations:
+        if len(candidates) == 0:
+            break
+        total = np.zeros((len(candidates), 3), dtype=np.int32)
+        for j in np.nonzero(coefficients)[0]:
+            total += coefficients[j] * cipher_blocks[candidates + j]
+        candidates = candidates[(total % 26 == 0).all(axis=1)]
+    return candidates
+
+
+def _score_candidate(cipher_blocks, plan, offset, hill_inverse, period, sample_blocks):
+    """
+    Recover the Vigenère shifts of every crib phase for one candidate and
+    score the decryption of a sample of ciphertext blocks in those phases.
+
+    Returns:
+        tuple: (shifts by phase, chi-squared per letter of the sample)
+    """
+    blocks = plan['blocks']
+    block_shifts = {}
+    for j in plan['firsts']:
+        # C = H (P + V)  =>  V = H^-1 C - P
+        block_shifts[(offset + j) % period] = (hill_inverse @ cipher_blocks[offset + j] - blocks[j]) % 26
+
+    shift_table = np.zeros((period, 3), dtype=np.int64)
+    known_phase = np.zeros(period, dtype=bool)
+    for phase, shifts in block_shifts.items():
+        shift_table[phase] = shifts
+        known_phase[phase] = True
+
+    phases = np.arange(len(cipher_blocks)) % period
+    sample = np.nonzero(known_phase[phases])[0][:sample_blocks]
+    decrypted = (cipher_blocks[sample] @ hill_inverse.T - shift_table[phases[sample]]) % 26
+    counts = np.bincount(decrypted.ravel(), minlength=26)
+    n = counts.sum()
+    expected = n * ENGLISH_FREQ
+    chi_squared = float((((counts - expected) ** 2) / expected).sum() / n)
+    return block_shifts, chi_squared
+
+
+def _vigenere_key(block_shifts, key_length):
+    """
+    Assemble the Vigenère key letters covered by the crib phases.
+
+    Returns:
+        tuple: (key with '?' for unknown letters, overlapping letters checked,
+        overlapping letters that agree)
+    """
+    key = [None] * key_length
+    checks = 0
+    agreements = 0
+    for phase, shifts in block_shifts.items():
+        for t in range(3):
+            position = (3 * phase + t) % key_length
+            if key[position] is None:
+                key[position] = int(shifts[t])
+            else:
+                checks += 1
+                agreements += key[position] == shifts[t]
+    return ''.join('?' if s is None else chr(s + ord('A')) for s in key), checks, agreements
+
+
+def crib_drag_attack(full_ciphertext, cribs, max_key_length=12, top_n=10, sample_blocks=2000):
+    """
+    Known-plaintext attack with a probable word at an unknown position.
+
+    Theory: with Vigenère key length m, the Hill input of block b is
+    P_b + V_b where V_b repeats every q = m / gcd(m, 3) blocks, so
+    C_b = H × P_b + d_(b mod q) (mod 26). Differences of crib blocks in the
+    same phase cancel d and give H exactly; extra crib blocks give linear
+    checks that every offset is screened with in one array pass. Surviving
+    offsets yield H, the covered Vigenère key letters, and a decryption of
+    the rest of the ciphertext.
+
+    A crib must cover at least q + 4 whole blocks to be checkable, so for
+    the shortest Vigenère keys it needs about 15 letters or more. Alignments
+    whose block differences are not invertible mod 26 leave H ambiguous and
+    are skipped.
+
+    Args:
+        full_ciphertext: Complete encrypted message (with length prefix)
+        cribs: A probable plaintext fragment, or an iterable of them
+        max_key_length: Largest Vigenère key length to try
+        top_n: Number of results to return
+        sample_blocks: Ciphertext blocks decrypted to score each candidate
+
+    Returns:
+        list: Result dicts ranked by consistency score, then by chi-squared
+        per letter of the decryption (lower is more English-like). As in
+        two_layer_attack, 'hill_key' is the matrix and 'full_key' the key in
+        get_full_key() form, with '?' for Vigenère letters the crib missed.
+    """
+    if isinstance(cribs, str):
+        cribs = [cribs]
+
+    ciphertext = full_ciphertext.upper()[2:]
+    cipher_nums = [ord(c) - ord('A') for c in ciphertext if 'A' <= c <= 'Z']
+    cipher_blocks = np.array(cipher_nums[:len(cipher_nums) - len(cipher_nums) % 3], dtype=np.int32).reshape(-1, 3)
+    cipher_columns = np.ascontiguousarray(cipher_blocks.T)
+
+    # Key lengths grouped by their block period q
+    key_lengths_by_period = {}
+    for key_length in range(1, max_key_length + 1):
+        period = key_length // math.gcd(key_length, 3)
+        key_lengths_by_period.setdefault(period, []).append(key_length)
+
+    results = []
+    for crib in cribs:
+        crib = _clean_crib(crib)
+        crib_nums = [ord(c) - ord('A') for c in crib]
+
+        for alignment in range(3):
+            for period, key_lengths in key_lengths_by_period.items():
+                plan = _plan_crib(crib_nums, alignment, period)
+                if plan is None:
+                    continue
+
+                # The crib's first letter must not fall before the message start
+                first_offset = 1 if alignment else 0
+                offsets = _consistent_offsets(cipher_blocks, cipher_columns, plan['relations'], first_offset)
+                if len(offsets) == 0:
+                    continue
+
+                # Solve H = ΔC × ΔP^-1 for all surviving offsets at once
+                delta_c = np.stack([cipher_blocks[offsets + jo] - cipher_blocks[offsets + jf]
+                                    for jf, jo in plan['solve_pairs']], axis=-1)
+                hill_keys = (delta_c @ plan['delta_p_inv']) % 26
+                hill_inverses, invertible = inverse_3x3_mod26(hill_keys)
+
+                crib_checks = 3 * len(plan['relations'])
+                for offset, hill_key, hill_inverse in zip(offsets[invertible], hill_keys[invertible],
+                                                         hill_inverses[invertible]):
+                    block_shifts, chi_squared = _score_candidate(
+                        cipher_blocks, plan, int(offset), hill_inverse, period, sample_blocks
+                    )
+                    for key_length in key_lengths:
+                        vigenere_key, checks, agreements = _vigenere_key(block_shifts, key_length)
+                        results.append({
+                            'crib': crib,
+                            'offset': 3 * int(offset) - alignment,
+                            'key_length': key_length,
+                            'hill_key': hill_key,
+                            'vigenere_key': vigenere_key,
+                            'full_key': ''.join(chr(int(v) + ord('A')) for v in hill_key.ravel()) + vigenere_key,
+                            'consistency': float((crib_checks + agreements) / (crib_checks + checks)),
+                            'chi_squared': chi_squared,
+                        })
+
+    results.sort(key=lambda r: (-r['consistency'], r['chi_squared'], r['key_length']))
+    return results[:top_n]
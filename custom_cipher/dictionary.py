@@ -0,0 +1,313 @@
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from cipher import FALLBACK_HILL_KEY, CustomCipher
+from attack import inverse_3x3_mod26, strip_length_prefix
+from streaming import ENGLISH_FREQ
+
+LOG_FREQ = np.log(ENGLISH_FREQ).astype(np.float32)
+
+FALLBACK_KEY = np.array([ord(c) - ord('A') for c in FALLBACK_HILL_KEY], dtype=np.int64)
+
+INDEX_FILES = ['hill', 'inverse', 'vigenere_offsets', 'vigenere', 'word_offsets', 'words']
+
+
+def _is_valid(matrices):
+    """
+    Which flattened 3×3 matrices have a determinant coprime to 26.
+    """
+    m = matrices.reshape(-1, 3, 3)
+    det = (m[:, 0] * np.cross(m[:, 1], m[:, 2])).sum(axis=1) % 26
+    return np.gcd(det, 26) == 1
+
+
+def hill_key_schedule(key_nums):
+    """
+    Hill matrices for many keys at once, adjusted exactly as CustomCipher does.
+
+    Args:
+        key_nums: Array of shape (N, 9) with the letter values of each key's
+            first 9 characters (after upper-casing and J → I)
+
+    Returns:
+        np.ndarray: Flattened Hill matrices mod 26, shape (N, 9)
+    """
+    key_nums = np.asarray(key_nums, dtype=np.int64) % 26
+    matrices = key_nums.copy()
+    todo = np.nonzero(~_is_valid(key_nums))[0]
+
+    # Strategy 1: uniform adjustment
+    for adjustment in range(1, 26):
+        if len(todo) == 0:
+            return matrices
+        adjusted = (key_nums[todo] + adjustment) % 26
+        valid = _is_valid(adjusted)
+        matrices[todo[valid]] = adjusted[valid]
+        todo = todo[~valid]
+
+    # Strategy 2: adjust one position
+    for i in range(9):
+        for adjustment in range(1, 26):
+            if len(todo) == 0:
+                return matrices
+            adjusted = key_nums[todo].copy()
+            adjusted[:, i] = (adjusted[:, i] + adjustment) % 26
+            valid = _is_valid(adjusted)
+            matrices[todo[valid]] = adjusted[valid]
+            todo = todo[~valid]
+
+    # Strategy 3: mix with the base matrix, else use the base matrix itself
+    mixed = (key_nums[todo] + FALLBACK_KEY) % 26
+    valid = _is_valid(mixed)
+    matrices[todo[valid]] = mixed[valid]
+    matrices[todo[~valid]] = FALLBACK_KEY
+    return matrices
+
+
+def _write_chunk(files, words, offsets):
+    """
+    Compute the key schedules for a chunk of words and append them to the index.
+    """
+    hill_nums = np.array([[ord(c) - ord('A') for c in word[:9].upper().replace('J', 'I')] for word in words])
+    hill = hill_key_schedule(hill_nums)
+    inverse, _ = inverse_3x3_mod26(hill.reshape(-1, 3, 3))
+
+    vigenere = [[(ord(c.upper()) - ord('A')) % 26 for c in word[9:]] for word in words]
+    lengths = np.array([len(v) for v in vigenere], dtype=np.int64)
+    encoded = [word.encode('ascii') for word in words]
+    word_lengths = np.array([len(w) for w in encoded], dtype=np.int64)
+
+    files['hill'].write(hill.astype(np.uint8).tobytes())
+    files['inverse'].write(inverse.reshape(-1, 9).astype(np.uint8).tobytes())
+    files['vigenere'].write(np.array([s for v in vigenere for s in v], dtype=np.uint8).tobytes())
+    files['words'].write(b''.join(encoded))
+    files['vigenere_offsets'].write((offsets[0] + np.cumsum(lengths)).tobytes())
+    files['word_offsets'].write((offsets[1] + np.cumsum(word_lengths)).tobytes())
+
+    return offsets[0] + int(lengths.sum()), offsets[1] + int(word_lengths.sum())
+
+
+def build_index(wordlist_path, index_dir, chunk_size=100000):
+    """
+    Precompute the key schedule of every usable key in a wordlist.
+
+    Each line of the wordlist is one candidate key. Keys shorter than 10
+    characters are rejected by CustomCipher and skipped; so are non-ASCII
+    keys. The index directory gets one raw binary file per array
+    (Hill matrices, inverse matrices, Vigenère shifts and the words
+    themselves) plus index.json, and is memory-mapped by load_index.
+
+    Args:
+        wordlist_path: Text file with one candidate key per line
+        index_dir: Directory to write the index to
+        chunk_size: Words processed per batch
+
+    Returns:
+        int: Number of keys in the index
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    files = {name: open(os.path.join(index_dir, name + '.bin'), 'wb') for name in INDEX_FILES}
+    count = 0
+    offsets = (0, 0)
+
+    try:
+        files['vigenere_offsets'].write(np.zeros(1, dtype=np.int64).tobytes())
+        files['word_offsets'].write(np.zeros(1, dtype=np.int64).tobytes())
+
+        with open(wordlist_path, 'r', encoding='utf-8', errors='replace') as f:
+            chunk = []
+            for line in f:
+                word = line.rstrip('\r\n')
+                if len(word) >= 10 and word.isascii():
+                    chunk.append(word)
+                if len(chunk) == chunk_size:
+                    offsets = _write_chunk(files, chunk, offsets)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                offsets = _write_chunk(files, chunk, offsets)
+                count += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(os.path.join(index_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'count': count}, f)
+    return count
+
+
+def load_index(index_dir):
+    """
+    Memory-map an index written by build_index.
+
+    Returns:
+        dict: Read-only arrays, keyed by name, plus 'count'
+    """
+    with open(os.path.join(index_dir, 'index.json'), 'r', encoding='utf-8') as f:
+        count = json.load(f)['count']
+
+    def mapped(name, dtype, shape=None):
+        path = os.path.join(index_dir, name + '.bin')
+        if os.path.getsize(path) == 0:
+            return np.zeros(shape or 0, dtype=dtype)
+        array = np.memmap(path, dtype=dtype, mode='r')
+        return array if shape is None else array.reshape(shape)
+
+    return {
+        'count': count,
+        'hill': mapped('hill', np.uint8, (count, 9)),
+        'inverse': mapped('inverse', np.uint8, (count, 3, 3)),
+        'vigenere_offsets': mapped('vigenere_offsets', np.int64),
+        'vigenere': mapped('vigenere', np.uint8),
+        'word_offsets': mapped('word_offsets', np.int64),
+        'words': mapped('words', np.uint8),
+    }
+
+
+def index_word(index, i):
+    """
+    The wordlist entry stored at position i of an index.
+    """
+    start, end = index['word_offsets'][i], index['word_offsets'][i + 1]
+    return index['words'][start:end].tobytes().decode('ascii')
+
+
+def _score_batch(index, start, end, targets, sample_letters):
+    """
+    Decrypt the start of every target ciphertext with keys [start, end) and
+    return the mean English log-likelihood per letter of the keys for each
+    target. Targets without sample letters (None) get None.
+    """
+    # Integer products stay far below 2^24, so float32 matmul is exact
+    inverses = np.asarray(index['inverse'][start:end], dtype=np.float32)
+    vig_offsets = np.asarray(index['vigenere_offsets'][start:end + 1])
+    vig_lengths = np.diff(vig_offsets)
+    vig_data = np.asarray(index['vigenere'][vig_offsets[0]:vig_offsets[-1]], dtype=np.int16)
+    positions = np.arange(sample_letters)
+    shift_index = (vig_offsets[:-1, None] - vig_offsets[0]) + positions % vig_lengths[:, None]
+    shifts = vig_data[shift_index]
+
+    scores = []
+    for blocks in targets:
+        if blocks is None:
+            scores.append(None)
+            continue
+        n = min(sample_letters, 3 * len(blocks))
+        hill_output = (inverses @ blocks.T).astype(np.int16) % 26
+        hill_output = hill_output.transpose(0, 2, 1).reshape(len(inverses), -1)[:, :n]
+        plain = (hill_output - shifts[:, :n]) % 26
+        scores.append(LOG_FREQ[plain].mean(axis=1))
+    return scores
+
+
+def dictionary_attack(ciphertexts, index, top_n=5, batch_size=65536, sample_letters=120):
+    """
+    Try every key in a precomputed index against one or more ciphertexts.
+
+    Each key batch is read from the memory-mapped index once and used for
+    every ciphertext. Candidates are ranked by the English log-likelihood
+    of the first sample_letters letters of their decryption; only the top
+    few are fully decrypted with CustomCipher.
+
+    Args:
+        ciphertexts: A ciphertext (with length prefix) or a list of them
+        index: Index returned by load_index
+        top_n: Number of candidate keys to return per ciphertext
+        batch_size: Keys decrypted per batch
+        sample_letters: Letters of each ciphertext used for scoring
+
+    Returns:
+        list: For each ciphertext, a list of result dicts, best first. The
+        list is empty for a ciphertext with no letters to score.
+    """
+    if isinstance(ciphertexts, str):
+        ciphertexts = [ciphertexts]
+
+    targets = []
+    for ciphertext in ciphertexts:
+        if len(ciphertext) < 2:
+            targets.append(None)
+            continue
+        original_length, hill_body = strip_length_prefix(ciphertext)
+        body = [ord(c) - ord('A') for c in hill_body.upper() if 'A' <= c <= 'Z']
+        n_blocks = min(math.ceil(min(sample_letters, original_length) / 3), len(body) // 3)
+        if n_blocks <= 0:
+            # Nothing to score: skip it rather than rank keys on NaN
+            targets.append(None)
+            continue
+        targets.append(np.array(body[:3 * n_blocks], dtype=np.float32).reshape(n_blocks, 3))
+
+    best = [[] for _ in ciphertexts]
+    for start in range(0, index['count'], batch_size):
+        end = min(start + batch_size, index['count'])
+        for t, scores in enumerate(_score_batch(index, start, end, targets, sample_letters)):
+            if scores is None:
+                continue
+            keep = min(top_n, len(scores))
+            for i in np.argpartition(-scores, keep - 1)[:keep]:
+                entry = (float(scores[i]), start + int(i))
+                if len(best[t]) < top_n:
+                    heapq.heappush(best[t], entry)
+                else:
+                    heapq.heappushpop(best[t], entry)
+
+    results = []
+    for ciphertext, candidates in zip(ciphertexts, best):
+        ranked = []
+        for score, i in sorted(candidates, reverse=True):
+            word = index_word(index, i)
+            with contextlib.redirect_stdout(io.StringIO()):
+                cipher = CustomCipher(word)
+            ranked.append({
+                'key': word,
+                'full_key': cipher.get_full_key(),
+                'score': score,
+                'decrypted_text': cipher.decrypt(ciphertext),
+            })
+        results.append(ranked)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wordlist-driven key dictionary attack.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="precompute the key schedule index for a wordlist")
+    build.add_argument('wordlist', help="file with one candidate key per line")
+    build.add_argument('index', help="directory to write the index to")
+
+    attack = subparsers.add_parser('attack', help="try every indexed key against ciphertexts")
+    attack.add_argument('index', help="index directory written by 'build'")
+    attack.add_argument('ciphertexts', help="file with one ciphertext per line")
+    attack.add_argument('--top', type=int, default=5, help="candidates to report per ciphertext")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.command == 'build':
+        count = build_index(args.wordlist, args.index)
+        print(f"Indexed {count} keys")
+    else:
+        # Keep the length prefix as written (see strip_length_prefix)
+        with open(args.ciphertexts, 'r', encoding='utf-8') as f:
+            lines = [line.rstrip('\r\n') for line in f]
+        ciphertexts = [line[:2] + ''.join(c for c in line[2:] if not c.isspace()) for line in lines if line]
+        results = dictionary_attack(ciphertexts, load_index(args.index), top_n=args.top)
+        for ciphertext, ranked in zip(ciphertexts, results):
+            print(f"\nCiphertext: {ciphertext[:50]}{'...' if len(ciphertext) > 50 else ''}")
+            if not ranked:
+                print("  Ciphertext too short to score")
+            for result in ranked:
+                print(f"  {result['score']:.3f}  {result['key']}  → {result['decrypted_text'][:50]}")
+    print(f"Time: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
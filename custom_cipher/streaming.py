@@ -0,0 +1,202 @@
+import numpy as np
+
+from attack import english_freq
+
+ENGLISH_FREQ = np.array([english_freq[chr(ord('A') + i)] for i in range(26)])
+
+# Maps every byte to its letter index (0-25), or -1 for non-letters
+_LETTER_TABLE = np.full(256, -1, dtype=np.int8)
+for _i in range(26):
+    _LETTER_TABLE[ord('A') + _i] = _i
+    _LETTER_TABLE[ord('a') + _i] = _i
+
+
+def ic_from_counts(counts):
+    """
+    Index of Coincidence from a letter histogram (last axis = 26 letters).
+    Works on a single histogram or on a stack of them.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    n = counts.sum(axis=-1)
+    numerator = (counts * (counts - 1)).sum(axis=-1)
+    denominator = n * (n - 1)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def chi_squared_from_counts(counts):
+    """
+    Chi-squared statistic of every Caesar shift of a letter histogram.
+
+    Returns an array whose last axis has 26 entries: entry s is the
+    chi-squared of the text after shifting every letter back by s, the
+    same value chi_squared_test gives for that decryption.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    n = counts.sum(axis=-1, keepdims=True)
+    # Decrypting with shift s turns ciphertext letter (p + s) into p, so the
+    # observed count of plaintext letter p is counts[(p + s) % 26]
+    index = (np.arange(26)[:, None] + np.arange(26)[None, :]) % 26
+    observed = counts[..., index]
+    expected = n[..., None] * ENGLISH_FREQ
+    terms = np.divide((observed - expected) ** 2, expected,
+                      out=np.zeros(observed.shape), where=expected > 0)
+    return terms.sum(axis=-1)
+
+
+class StreamingStats:
+    """
+    Constant-memory letter statistics for ciphertexts too large to hold in memory.
+
+    Keeps one 26-letter histogram per (key length, column) pair for every
+    key length up to max_key_length. Ciphertext is fed in chunks of any
+    size; only letters count, so the column of a letter is its position
+    among letters (matching how the Vigenère layer advances its key).
+
+    Accumulators built on consecutive parts of the same ciphertext can be
+    merged in order, even when each part was counted from offset 0.
+    """
+
+    def __init__(self, max_key_length=20, offset=0):
+        self.max_key_length = max_key_length
+        self.start = offset
+        self.position = offset
+        # counts[L][c] is the histogram of column c for key length L
+        self.counts = [None] + [np.zeros((key_len, 26), dtype=np.int64)
+                                for key_len in range(1, max_key_length + 1)]
+
+    @property
+    def letters_seen(self):
+        return int(self.counts[1].sum())
+
+    def update(self, chunk):
+        """
+        Add a chunk of ciphertext (str or bytes). Non-letters are ignored.
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii', errors='ignore')
+        letters = _LETTER_TABLE[np.frombuffer(chunk, dtype=np.uint8)]
+        letters = letters[letters >= 0].astype(np.int64)
+        if letters.size == 0:
+            return self
+
+        positions = self.position + np.arange(letters.size, dtype=np.int64)
+        for key_len in range(1, self.max_key_length + 1):
+            columns = positions % key_len
+            self.counts[key_len] += np.bincount(
+                columns * 26 + letters, minlength=key_len * 26
+            ).reshape(key_len, 26)
+
+        self.position += letters.size
+        return self
+
+    def merge(self, other):
+        """
+        Append the statistics of the ciphertext that follows this one.
+
+        The other accumulator's columns are rotated so that its first letter
+        lands at this accumulator's current position. An accumulator that
+        was created with the correct absolute offset needs no rotation; one
+        that was started at offset 0 on a later chunk (for example on another
+        machine) is realigned here. Merge parts in ciphertext order.
+        """
+        if other.max_key_length != self.max_key_length:
+            raise ValueError("Cannot merge statistics with different maximum key lengths")
+        phase = self.position - other.start
+        for key_len in range(1, self.max_key_length + 1):
+            self.counts[key_len] += np.roll(other.counts[key_len], phase % key_len, axis=0)
+        self.position += other.position - other.start
+        return self
+
+    def index_of_coincidence(self):
+        """
+        IC of the whole ciphertext seen so far.
+        """
+        return float(ic_from_counts(self.counts[1][0]))
+
+    def column_ic(self, key_length):
+        """
+        IC of every column for the given key length.
+        """
+        return ic_from_counts(self.counts[key_length])
+
+    def find_key_length(self, max_length=None):
+        """
+        Estimate the Vigenère key length, same rule as find_key_length.
+        """
+        if max_length is None:
+            max_length = self.max_key_length
+        best_length = 1
+        best_avg_ic = 0
+
+        for key_len in range(1, max_length + 1):
+            columns = self.counts[key_len]
+            usable = columns.sum(axis=1) > 1
+            if not usable.any():
+                continue
+            avg_ic = float(ic_from_counts(columns[usable]).mean())
+            if abs(avg_ic - 0.065) < abs(best_avg_ic - 0.065):
+                best_avg_ic = avg_ic
+                best_length = key_len
+
+        return best_length
+
+    def chi_squared(self, key_length):
+        """
+        Chi-squared of every shift for every column: shape (key_length, 26).
+        """
+        return chi_squared_from_counts(self.counts[key_length])
+
+    def best_shifts(self, key_length):
+        """
+        Most likely Vigenère key for the given key length.
+
+        Returns:
+            tuple: (recovered_key, chi_squared of each column at its best shift)
+        """
+        chi = self.chi_squared(key_length)
+        shifts = chi.argmin(axis=1)
+        recovered_key = ''.join(chr(int(s) + ord('A')) for s in shifts)
+        return recovered_key, chi[np.arange(key_length), shifts]
+
+    def save(self, path):
+        """
+        Write the histograms to a .npz file so they can be merged elsewhere.
+        """
+        arrays = {f'counts_{key_len}': self.counts[key_len] for key_len in range(1, self.max_key_length + 1)}
+        np.savez_compressed(path, start=self.start, position=self.position, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read histograms written by save().
+        """
+        with np.load(path) as data:
+            max_key_length = sum(1 for name in data.files if name.startswith('counts_'))
+            stats = cls(max_key_length, int(data['start']))
+            stats.position = int(data['position'])
+            for key_len in range(1, max_key_length + 1):
+                stats.counts[key_len] = data[f'counts_{key_len}'].astype(np.int64)
+        return stats
+
+
+def stream_file(path, max_key_length=20, chunk_size=1 << 20, offset=0):
+    """
+    Build StreamingStats for a ciphertext file, reading it chunk by chunk.
+
+    Args:
+        path: File containing the ciphertext (letters only are counted)
+        max_key_length: Largest key length to keep histograms for
+        chunk_size: Bytes read per chunk
+        offset: Letter position at which this file starts in the full ciphertext
+
+    Returns:
+        StreamingStats: The accumulated statistics
+    """
+    stats = StreamingStats(max_key_length, offset)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            stats.update(chunk)
+    return stats
@@ -0,0 +1,251 @@
+import functools
+import itertools
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from attack import inverse_3x3_mod26, strip_length_prefix
+from streaming import chi_squared_from_counts, ic_from_counts
+
+# Residues with a multiplicative inverse mod 26
+UNITS = np.array([u for u in range(26) if math.gcd(u, 26) == 1])
+
+# Frequent English digrams, used to order candidates whose letter
+# frequencies are identical (e.g. the same rows in a different order)
+COMMON_BIGRAMS = [
+    'TH', 'HE', 'IN', 'ER', 'AN', 'RE', 'ND', 'AT', 'ON', 'NT', 'HA', 'ES', 'ST', 'EN', 'ED',
+    'TO', 'IT', 'OU', 'EA', 'HI', 'IS', 'OR', 'TI', 'AS', 'TE', 'ET', 'NG', 'OF', 'AL', 'DE',
+]
+_BIGRAM_TABLE = np.zeros(26 * 26, dtype=bool)
+for _bigram in COMMON_BIGRAMS:
+    _BIGRAM_TABLE[(ord(_bigram[0]) - ord('A')) * 26 + ord(_bigram[1]) - ord('A')] = True
+
+
+def candidate_rows():
+    """
+    Every possible row of an inverse Hill matrix, one per scaling class.
+
+    A row of a matrix invertible mod 26 cannot be all even or all multiples
+    of 13. Multiplying a row by a unit only relabels the letters it
+    produces, so letter statistics such as IC are the same for all 12
+    multiples; only the smallest multiple is kept.
+    """
+    rows = np.array(list(itertools.product(range(26), repeat=3)))
+    weights = np.array([676, 26, 1])
+    codes = rows @ weights
+    scaled_codes = np.stack([((u * rows) % 26) @ weights for u in UNITS])
+    usable = (rows % 2).any(axis=1) & (rows % 13).any(axis=1)
+    return rows[usable & (codes == scaled_codes.min(axis=0))]
+
+
+@functools.lru_cache(maxsize=4)
+def _row_streams(blocks_bytes, n_blocks):
+    """
+    Letters produced by every candidate row on the sampled ciphertext blocks.
+
+    Shared by every key length and every candidate matrix searched for the
+    same ciphertext in this process.
+
+    Returns:
+        tuple: (rows, streams) with streams[r, b] = rows[r] · C_b mod 26
+    """
+    blocks = np.frombuffer(blocks_bytes, dtype=np.int64).reshape(n_blocks, 3)
+    rows = candidate_rows()
+    return rows, ((rows @ blocks.T) % 26).astype(np.int64)
+
+
+def _search_key_length(blocks, key_length, deadline, top_rows, row_pool):
+    """
+    Search Hill inverse rows and Vigenère shifts for one Vigenère key length.
+
+    Stage 1 ranks every row by the mean IC of its letters split by key
+    phase. Stage 2 picks the best unit multiple and shifts for the top rows
+    by chi-squared. Stage 3 tries every ordered triple of the best rows as
+    an inverse matrix and solves the Vigenère key on the full Hill output.
+
+    Returns:
+        dict or None: Best candidate for this key length, or None if the
+        time budget ran out or no invertible matrix was found
+    """
+    if deadline is not None and time.time() >= deadline:
+        return None
+
+    n_blocks = len(blocks)
+    rows, streams = _row_streams(blocks.tobytes(), n_blocks)
+    n_rows = len(rows)
+
+    # Row letters at block b all use the key letter of block phase b mod q
+    period = key_length // math.gcd(key_length, 3)
+    phases = np.arange(n_blocks) % period
+
+    # Stage 1: IC of every row, by phase
+    index = (np.arange(n_rows)[:, None] * period + phases) * 26 + streams
+    counts = np.bincount(index.ravel(), minlength=n_rows * period * 26).reshape(n_rows, period, 26)
+    row_ic = ic_from_counts(counts).mean(axis=1)
+    top = np.argsort(-row_ic)[:top_rows]
+
+    if deadline is not None and time.time() >= deadline:
+        return None
+
+    # Stage 2: best unit multiple of each top row. Scaling by u moves the
+    # count of letter l to letter u*l; the shifts are solved per phase.
+    scaled = np.zeros((len(top), len(UNITS), period, 26))
+    for k, u in enumerate(UNITS):
+        scaled[:, k][..., (u * np.arange(26)) % 26] = counts[top]
+    chi = chi_squared_from_counts(scaled).min(axis=-1).sum(axis=-1)
+    best_unit = chi.argmin(axis=1)
+    row_chi = chi[np.arange(len(top)), best_unit]
+    order = np.argsort(row_chi)[:row_pool]
+    pool_rows = (UNITS[best_unit[order]][:, None] * rows[top[order]]) % 26
+
+    # Stage 3: every ordered triple of pooled rows as an inverse Hill matrix
+    triples = np.array(list(itertools.permutations(range(len(pool_rows)), 3)))
+    if len(triples) == 0:
+        return None
+    inverses = pool_rows[triples]
+    _, invertible = inverse_3x3_mod26(inverses)
+    inverses = inverses[invertible]
+    if len(inverses) == 0:
+        return None
+
+    n_triples = len(inverses)
+    hill_output = np.einsum('tij,bj->tbi', inverses, blocks).reshape(n_triples, -1) % 26
+    n_letters = hill_output.shape[1]
+    columns = np.arange(n_letters) % key_length
+    index = (np.arange(n_triples)[:, None] * key_length + columns) * 26 + hill_output
+    counts = np.bincount(index.ravel(), minlength=n_triples * key_length * 26).reshape(n_triples, key_length, 26)
+    chi = chi_squared_from_counts(counts)
+    shifts = chi.argmin(axis=-1)
+    chi_per_letter = chi.min(axis=-1).sum(axis=-1) / n_letters
+
+    plain = (hill_output - shifts[:, columns]) % 26
+    bigram_rate = _BIGRAM_TABLE[plain[:, :-1] * 26 + plain[:, 1:]].mean(axis=1)
+
+    best = min(range(n_triples), key=lambda t: (round(float(chi_per_letter[t]), 9), -bigram_rate[t]))
+    return {
+        'key_length': key_length,
+        'hill_inverse': inverses[best],
+        'shifts': shifts[best],
+        'chi_squared': float(chi_per_letter[best]),
+    }
+
+
+def two_layer_attack(full_ciphertext, max_key_length=12, time_budget=None, workers=None,
+                     sample_blocks=3000, top_rows=40, row_pool=6):
+    """
+    Ciphertext-only attack on the full CustomCipher pipeline.
+
+    Theory: row i of the inverse Hill matrix maps every ciphertext block
+    C_b to letter 3b+i of the Vigenère ciphertext. For the right row those
+    letters split into key-phase columns that each look like shifted
+    English (IC ≈ 0.065), so each of the 26³ rows can be scored on its own
+    instead of searching 26⁹ matrices. Rows are searched jointly with the
+    Vigenère key length, pruned by IC and then by chi-squared, and the
+    surviving rows are assembled into inverse matrices whose Hill output is
+    solved for the Vigenère key.
+
+    Key lengths are searched in parallel worker processes, each of which
+    computes the row outputs once and reuses them for every key length it
+    handles. Once the time budget is spent, unfinished key lengths are
+    dropped and the best result so far is returned.
+
+    Args:
+        full_ciphertext: Complete encrypted message (with length prefix)
+        max_key_length: Largest Vigenère key length to try
+        time_budget: Seconds allowed for the search, or None for no limit
+        workers: Worker processes (defaults to the CPU count, 1 runs in-process)
+        sample_blocks: Ciphertext blocks used for the statistics
+        top_rows: Rows kept after the IC stage, per key length
+        row_pool: Rows kept after the chi-squared stage, per key length
+
+    Returns:
+        dict: Attack results, including the recovered key in get_full_key() form
+    """
+    results = {
+        'success': False,
+        'hill_key': None,
+        'vigenere_key': None,
+        'full_key': None,
+        'decrypted_text': None,
+        'method_used': None,
+        'confidence': 0,
+        'timed_out': False,
+    }
+
+    if len(full_ciphertext) < 2:
+        results['error'] = "Ciphertext too short"
+        return results
+
+    start = time.time()
+    deadline = None if time_budget is None else start + time_budget
+
+    original_length, ciphertext = strip_length_prefix(full_ciphertext)
+    body = [ord(c) - ord('A') for c in ciphertext.upper() if 'A' <= c <= 'Z']
+    all_blocks = np.array(body[:len(body) - len(body) % 3], dtype=np.int64).reshape(-1, 3)
+
+    # Only blocks made entirely of message letters (no padding) feed the statistics
+    blocks = all_blocks[:min(original_length // 3, sample_blocks)]
+    if len(blocks) < 3:
+        results['error'] = "Ciphertext too short"
+        return results
+
+    key_lengths = range(1, max_key_length + 1)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    found = []
+    if workers == 1:
+        for key_length in key_lengths:
+            found.append(_search_key_length(blocks, key_length, deadline, top_rows, row_pool))
+            if deadline is not None and time.time() >= deadline:
+                results['timed_out'] = True
+                break
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        pending = {pool.submit(_search_key_length, blocks, key_length, deadline, top_rows, row_pool)
+                   for key_length in key_lengths}
+        while pending:
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            found.extend(future.result() for future in done)
+            if not done:
+                results['timed_out'] = True
+                break
+        pool.shutdown(wait=not results['timed_out'], cancel_futures=True)
+
+    found = [candidate for candidate in found if candidate is not None]
+    if deadline is not None and time.time() >= deadline and len(found) < len(key_lengths):
+        results['timed_out'] = True
+    if not found:
+        results['error'] = "No candidate found within the time budget"
+        return results
+
+    # Multiples of the true key length fit as well or slightly better, so
+    # fall back from the best fit to its shortest divisor that fits nearly
+    # as well
+    best = min(found, key=lambda candidate: candidate['chi_squared'])
+    for candidate in sorted(found, key=lambda candidate: candidate['key_length']):
+        if best['key_length'] % candidate['key_length'] == 0 and \
+                candidate['chi_squared'] <= 1.25 * best['chi_squared']:
+            best = candidate
+            break
+
+    hill_inverse = best['hill_inverse']
+    hill_key, _ = inverse_3x3_mod26(hill_inverse)
+    vigenere_key = ''.join(chr(int(s) + ord('A')) for s in best['shifts'])
+
+    hill_output = ((all_blocks @ hill_inverse.T) % 26).ravel()[:original_length]
+    plain = (hill_output - best['shifts'][np.arange(len(hill_output)) % best['key_length']]) % 26
+
+    results['hill_key'] = hill_key
+    results['vigenere_key'] = vigenere_key
+    results['full_key'] = ''.join(chr(int(v) + ord('A')) for v in hill_key.ravel()) + vigenere_key
+    results['decrypted_text'] = ''.join(chr(int(v) + ord('A')) for v in plain)
+    results['method_used'] = 'Two-Layer Search'
+    results['confidence'] = max(0.0, 100 * (1 - best['chi_squared']))
+    results['success'] = True
+    results['elapsed'] = time.time() - start
+    return results